@@ -1,37 +1,88 @@
 import io
+import uuid
+from pathlib import Path
+import numpy as np
 import pandas as pd
 import streamlit as st
+import plotly.express as px
 import plotly.graph_objects as go
+import xlsxwriter
 from streamlit_option_menu import option_menu
 
 
 # our helpers (already written earlier)
-from data import load_all          # uses your 01.xlsx + optional 02_budget.xlsx and maps account_group correctly
-from metrics import kpis, monthly_pnl
-from charts import kpi_card_md, donut, line_two, waterfall_from_monthly, inject_watermark
+from data import load_all, add_group_flags, as_categories, other_income_mask, TXN_FILE, BUDGET_FILE  # uses your 01.xlsx + optional 02_budget.xlsx and maps account_group correctly
+from metrics import group_year_month_sums
+from charts import kpi_card_md, naira_labels, donut, line_two, waterfall_from_monthly, inject_watermark
 
 
 
 # --------------------
-# Page & watermark
+# Constants
 # --------------------
-st.set_page_config(page_title="Financial Performance", layout="wide")
+_MONTH_NAMES = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
 
-
-# Widen the main content container a bit
-st.markdown("""
+# Page-wide CSS, sent as one block per run (Streamlit drops anything a rerun doesn't re-emit)
+_PAGE_CSS = """
 <style>
+/* Widen the main content container a bit */
 .block-container { max-width: 1500px; padding-top: 0.5rem; padding-bottom: 0.5rem; }
+/* KPI cards */
+.kpi-card { background:#f9fafb; border-radius:12px; padding:20px;
+            box-shadow:0 2px 5px rgba(0,0,0,0.05); text-align:center; margin-bottom:20px; }
+.kpi-value { font-size:1.6rem; font-weight:700; }
+.kpi-sub   { font-size:0.9rem; }
+</style>
+"""
+
+# Wider dropdown/multiselect (Revenue page filters only)
+_WIDE_SELECT_CSS = """
+<style>
+div[data-baseweb="select"] { min-width: 250px; }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# --------------------
+# Page & watermark
+# --------------------
+st.set_page_config(page_title="Financial Performance", layout="wide")
+
+st.markdown(_PAGE_CSS, unsafe_allow_html=True)
 
 inject_watermark(st, "logo.png")
 
 # --------------------
 # Load data (DO NOT edit your files)
 # --------------------
+def _compact_periods(df):
+    # year/month are derived from the parsed date in load_all; pages never re-derive them
+    for col, dtype in (("year", "int16"), ("month", "int8")):
+        if col in df.columns and df[col].notna().all():
+            df[col] = df[col].astype(dtype)
+    return df
+
+def _mtime(path):
+    p = Path(path)
+    return p.stat().st_mtime if p.exists() else None
+
+@st.cache_data(show_spinner=False)
+def _cached_load_all(txn_path, budget_path, txn_mtime, bud_mtime):
+    # parsed once per file version (the mtimes are part of the key, so saving 01/02 reloads them);
+    # served from memory on every other rerun (returns a copy, so page edits don't leak back)
+    tx, bd = load_all(txn_path, budget_path)
+    return _compact_periods(tx), _compact_periods(bd)
+
+if st.sidebar.button("Reload data", use_container_width=True):
+    # drop the parsed files and every summary / slice built from them
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+_file_mtimes = (_mtime(TXN_FILE), _mtime(BUDGET_FILE))
+# data-version token for the base files; uploads replace it with their own (see "Apply uploads")
+_BASE_KEY = "base:{}:{}".format(*_file_mtimes)
+
 try:
-    tx, bd = load_all()   # tx has: account_group in {"Revenue","COGS","OPEX"} and signed_amount (+/-) ready
+    tx, bd = _cached_load_all(TXN_FILE, BUDGET_FILE, *_file_mtimes)   # tx has: account_group in {"Revenue","COGS","OPEX"} and signed_amount (+/-) ready
 except Exception as e:
     st.error(f"Data loading error: {e}")
     st.stop()
@@ -39,12 +90,43 @@ except Exception as e:
 # --------------------
 # Optional: user uploads to update/append data
 # --------------------
-def _read_any_table(uploaded):
+# Raw headers the upload normalizers rename or derive from, so they must survive the column filter
+_UPLOAD_ALIASES = ("date", "Date", "AMOUNT", "amount", "Budget")
+
+def _read_any_table(uploaded, template=None):
+    # with a template: read only the columns we can use, with their dtypes given up front (no inference)
+    usecols = dtype = None
+    if template is not None:
+        wanted = set(template.columns) | set(_UPLOAD_ALIASES)
+        usecols = lambda c: str(c).strip() in wanted
+        dtype = {
+            c: ("float64" if pd.api.types.is_float_dtype(t) else "str")
+            for c, t in template.dtypes.items()
+            if pd.api.types.is_float_dtype(t) or isinstance(t, pd.CategoricalDtype) or pd.api.types.is_string_dtype(t)
+        }
+
     if uploaded.name.lower().endswith(".csv"):
-        df = pd.read_csv(uploaded)
+        if usecols is not None:
+            # pyarrow wants an explicit list of existing columns, not a callable
+            header = pd.read_csv(uploaded, nrows=0).columns
+            uploaded.seek(0)
+            usecols = [c for c in header if usecols(c)]
+        try:
+            df = pd.read_csv(uploaded, engine="pyarrow", usecols=usecols, dtype=dtype)
+        except ImportError:
+            # pyarrow not installed -> default C parser
+            uploaded.seek(0)
+            df = pd.read_csv(uploaded, usecols=usecols, dtype=dtype)
     else:
-        # default to excel; reads first sheet
-        df = pd.read_excel(uploaded)
+        # default to excel; reads first sheet (calamine is much faster than openpyxl)
+        try:
+            df = pd.read_excel(uploaded, engine="calamine", usecols=usecols, dtype=dtype)
+        except ImportError:
+            uploaded.seek(0)
+            df = pd.read_excel(
+                uploaded, engine="openpyxl", usecols=usecols, dtype=dtype,
+                engine_kwargs={"read_only": True, "data_only": True, "keep_links": False}
+            )
     return df
 
 def _ensure_period_cols(df):
@@ -60,18 +142,23 @@ def _normalize_uploaded_tx(df, tx_template):
     Make uploaded 01-like data look like current tx:
     - keep only columns that exist in your current tx
     - if signed_amount missing but AMOUNT present, derive sign from account_group
-    - ensure date/year/month exist
+    - ensure date/year/month exist, plus the abs_amount/period_ts/is_* helpers load_all adds
     """
     df = df.copy()
     df = _ensure_period_cols(df)
+    if "date" in df.columns:
+        df["period_ts"] = df["date"].dt.to_period("M").dt.to_timestamp()
+    df["is_other_income"] = other_income_mask(df)
+    if "account_group" in df.columns:
+        df = add_group_flags(df)
 
     # derive signed_amount if needed
     if "signed_amount" not in df.columns and "AMOUNT" in df.columns:
         if "account_group" in df.columns:
-            df["signed_amount"] = df["AMOUNT"].where(
-                df["account_group"].eq("Revenue"),
-                -df["AMOUNT"].abs()
-            )
+            # one pass on the raw arrays: Revenue keeps its sign, everything else is negative
+            amt = pd.to_numeric(df["AMOUNT"], errors="coerce").to_numpy(dtype="float64")
+            is_rev = df["account_group"].to_numpy() == "Revenue"
+            df["signed_amount"] = np.where(is_rev, amt, -np.abs(amt))
         else:
             # fall back: assume AMOUNT already signed
             df["signed_amount"] = pd.to_numeric(df["AMOUNT"], errors="coerce")
@@ -82,7 +169,8 @@ def _normalize_uploaded_tx(df, tx_template):
 
     # also make sure dtypes are friendly
     if "signed_amount" in df.columns:
-        df["signed_amount"] = pd.to_numeric(df["signed_amount"], errors="coerce").fillna(0)
+        df["signed_amount"] = np.nan_to_num(pd.to_numeric(df["signed_amount"], errors="coerce").to_numpy(dtype="float64"))
+        df["abs_amount"] = np.abs(df["signed_amount"])
 
     return df
 
@@ -111,13 +199,113 @@ def _normalize_uploaded_budget(df, bd_template):
     df = df[keep]
 
     if "budget_amount" in df.columns:
-        df["budget_amount"] = pd.to_numeric(df["budget_amount"], errors="coerce").fillna(0)
+        df["budget_amount"] = np.nan_to_num(pd.to_numeric(df["budget_amount"], errors="coerce").to_numpy(dtype="float64"))
 
     return df
 
-# Persist uploaded data across page switches
+# --------------------
+# Cached summaries: keyed on the data version + filter values
+# (args starting with "_" are not hashed by Streamlit, so the frame itself is never hashed)
+# --------------------
+@st.cache_data(show_spinner=False)
+def _monthly_agg(_df, data_key, year):
+    # monthly totals per account_group (columns: Revenue / COGS / OPEX)
+    agg = group_year_month_sums(_df)
+    for col in ("Revenue", "COGS", "OPEX"):
+        if col not in agg.columns: agg[col] = 0.0
+    return agg
+
+@st.cache_data(show_spinner=False)
+def _overview_figs(_agg, data_key, year):
+    # Revenue vs Expense (yearly) + monthly expense breakdown, built from the monthly aggregate.
+    # Cached as plain dicts so Plotly's figure construction/validation runs once per data version + year.
+    yearly = _agg.groupby(level="year").sum()
+    fig_rev_exp = go.Figure()
+    fig_rev_exp.add_bar(x=yearly.index.to_numpy(), y=yearly["Revenue"].to_numpy(), name="Revenue")
+    fig_rev_exp.add_bar(x=yearly.index.to_numpy(), y=(yearly["COGS"] + yearly["OPEX"]).to_numpy(), name="Expenses")
+    fig_rev_exp.update_layout(
+        barmode="group",
+        yaxis_title="₦",
+        xaxis_title="Year",
+        margin=dict(l=0, r=0, t=10, b=0)
+    )
+
+    exp_month = _agg[["COGS", "OPEX"]].reset_index()
+    periods = pd.PeriodIndex.from_fields(year=exp_month["year"], month=exp_month["month"], freq="M").to_timestamp().to_numpy()
+    fig_exp = go.Figure()
+    for grp in ["COGS", "OPEX"]:
+        fig_exp.add_bar(x=periods, y=exp_month[grp].to_numpy(), name=grp)
+    fig_exp.update_layout(barmode="stack", yaxis_title="₦", xaxis_title="Month", margin=dict(l=0,r=0,t=10,b=0))
+
+    return fig_rev_exp.to_dict(), fig_exp.to_dict()
+
+@st.cache_data(show_spinner=False)
+def _top_projects(_rev, data_key, year, months, proj_col):
+    # revenue per project, unsorted (callers take nlargest)
+    return (
+        _rev.groupby(proj_col, as_index=False, observed=True)["signed_amount"].sum()
+        .rename(columns={"signed_amount": "Revenue"})
+    )
+
+@st.cache_data(show_spinner=False)
+def _seasonality(_rev, data_key):
+    heat = _rev.groupby(["year", "month"], as_index=False)["signed_amount"].sum()
+    return heat.pivot_table(index="year", columns="month", values="signed_amount", aggfunc="sum", fill_value=0).sort_index()
+
+@st.cache_data(show_spinner=False)
+def _concat_chunks(_chunks, data_key, name):
+    # one concat per data version; "inner" keeps only the columns all chunks share
+    return as_categories(pd.concat(_chunks, join="inner", ignore_index=True))
+
+@st.cache_data(show_spinner=False)
+def _expense_agg(_exp, data_key, year, keys):
+    # one pass over the expense rows; every Expenses-page chart/table re-aggregates this small frame
+    return _exp.groupby(list(keys), as_index=False, observed=True, dropna=False)["abs_amount"].sum()
+
+def _slice_period(df, year, granularity, q=None, m=None):
+    # Slice DF to the requested P&L period
+    df = df[df["year"].eq(int(year))].copy()
+    if granularity == "Quarter" and q:
+        qmap = {"Q1":[1,2,3], "Q2":[4,5,6], "Q3":[7,8,9], "Q4":[10,11,12]}
+        df = df[df["month"].isin(qmap[q])]
+    if granularity == "Month" and m:
+        df = df[df["month"].eq(int(m))]
+    return df
+
+@st.cache_data(show_spinner=False)
+def _pl_sections(_df, data_key, year, gran, q, m):
+    # ACCOUNT totals within each account_group for one P&L period (largest first), plus the Other Income lines
+    S = _slice_period(_df, year, gran, q, m)
+    pl_agg = (
+        S.groupby(["account_group", "ACCOUNT"], observed=True, dropna=False, as_index=False)["signed_amount"]
+            .sum()
+            .sort_values("signed_amount", ascending=False, kind="stable")
+    )
+
+    # "Other Income" lines, flagged once at load time (see data.other_income_mask)
+    other_inc = S[S["is_other_income"]]
+    oi_agg = (
+        other_inc.groupby("ACCOUNT", as_index=False, observed=True)["signed_amount"]
+        .sum()
+        .sort_values("signed_amount", ascending=False, kind="stable")
+    )
+    return pl_agg, oi_agg
+
+@st.cache_resource(show_spinner=False)
+def _by_year(_tx, data_key):
+    # year -> rows of tx, split once per data version; shared object, so treat the slices as read-only
+    return {int(y): part for y, part in _tx.groupby("year", sort=False)}
+
+def _clear_summary_caches():
+    for fn in (_concat_chunks, _monthly_agg, _overview_figs, _top_projects, _seasonality, _expense_agg, _pl_sections, _by_year):
+        fn.clear()
+
+# Persist uploaded data across page switches (lists of chunks, see _concat_chunks)
 if "tx_user" not in st.session_state: st.session_state.tx_user = None
 if "bd_user" not in st.session_state: st.session_state.bd_user = None
+if "data_key" not in st.session_state: st.session_state.data_key = None
+# file_ids already folded into tx_user/bd_user, so re-clicking Apply never appends the same file twice
+if "applied_uploads" not in st.session_state: st.session_state.applied_uploads = {"tx": set(), "bd": set()}
 
 with st.sidebar.expander(" Upload monthly data", expanded=False):
     up_tx = st.file_uploader("Add transactions (01-like)", type=["xlsx", "xls", "csv"], key="u_tx")
@@ -126,44 +314,50 @@ with st.sidebar.expander(" Upload monthly data", expanded=False):
 
     if st.button("Apply uploads", type="primary", use_container_width=True):
         try:
+            applied = st.session_state.applied_uploads
             if up_tx is not None:
-                tx_new = _read_any_table(up_tx)
-                tx_new = _normalize_uploaded_tx(tx_new, tx)
                 if mode == "Replace":
-                    st.session_state.tx_user = tx_new
-                else:
-                    # Align columns then append
-                    aligned_cols = [c for c in tx_new.columns if c in tx.columns]
-                    tx_append = tx_new[aligned_cols]
-                    st.session_state.tx_user = pd.concat(
-                        [tx[aligned_cols], tx_append], ignore_index=True
-                    )
-            else:
-                st.session_state.tx_user = None if mode == "Replace" else st.session_state.tx_user
+                    tx_new = _normalize_uploaded_tx(_read_any_table(up_tx, tx), tx)
+                    st.session_state.tx_user = [tx_new]
+                    applied["tx"] = {up_tx.file_id}
+                elif up_tx.file_id not in applied["tx"]:
+                    tx_new = _normalize_uploaded_tx(_read_any_table(up_tx, tx), tx)
+                    # Buffer chunks; they are concatenated once when read back below
+                    if st.session_state.tx_user is None:
+                        st.session_state.tx_user = [tx]
+                    st.session_state.tx_user.append(tx_new)
+                    applied["tx"].add(up_tx.file_id)
+            elif mode == "Replace":
+                st.session_state.tx_user = None
+                applied["tx"] = set()
 
             if up_bd is not None:
-                bd_new = _read_any_table(up_bd)
-                bd_new = _normalize_uploaded_budget(bd_new, bd)
                 if mode == "Replace":
-                    st.session_state.bd_user = bd_new
-                else:
-                    aligned_cols = [c for c in bd_new.columns if c in bd.columns]
-                    bd_append = bd_new[aligned_cols]
-                    st.session_state.bd_user = pd.concat(
-                        [bd[aligned_cols], bd_append], ignore_index=True
-                    )
-            else:
-                st.session_state.bd_user = None if mode == "Replace" else st.session_state.bd_user
-
+                    bd_new = _normalize_uploaded_budget(_read_any_table(up_bd, bd), bd)
+                    st.session_state.bd_user = [bd_new]
+                    applied["bd"] = {up_bd.file_id}
+                elif up_bd.file_id not in applied["bd"]:
+                    bd_new = _normalize_uploaded_budget(_read_any_table(up_bd, bd), bd)
+                    if st.session_state.bd_user is None:
+                        st.session_state.bd_user = [bd]
+                    st.session_state.bd_user.append(bd_new)
+                    applied["bd"].add(up_bd.file_id)
+            elif mode == "Replace":
+                st.session_state.bd_user = None
+                applied["bd"] = set()
+
+            # new data version -> cached summaries must not be reused
+            st.session_state.data_key = uuid.uuid4().hex
+            _clear_summary_caches()
             st.success("Data applied. All pages will reflect the new uploads.")
         except Exception as e:
             st.error(f"Upload failed: {e}")
 
 # If we have uploaded replacements/appends, use them
 if st.session_state.tx_user is not None:
-    tx = st.session_state.tx_user
+    tx = _concat_chunks(st.session_state.tx_user, st.session_state.data_key, "tx")
 if st.session_state.bd_user is not None:
-    bd = st.session_state.bd_user
+    bd = _concat_chunks(st.session_state.bd_user, st.session_state.data_key, "bd")
 
 # --------------------
 # Sidebar: icon menu
@@ -198,8 +392,8 @@ else:
     with colf1:
         year = st.selectbox("Year", options=["All"] + list(years), key="global_year")
 
-DF = tx if year == "All" else tx[tx["year"].eq(int(year))]
-MN = monthly_pnl(DF)  # builds monthly Revenue/COGS/OPEX + Gross Profit + EBIT
+DATA_KEY = st.session_state.data_key or _BASE_KEY
+DF = tx if year == "All" else _by_year(tx, DATA_KEY)[int(year)]
 
 # =========================================================================
 # OVERVIEW
@@ -208,30 +402,26 @@ if page == "Overview":
     st.title("Financial Performance — Overview")
 
 
-    # --- Ensure year and month columns exist ---
-    if "date" in DF.columns:
-        DF["year"] = pd.to_datetime(DF["date"]).dt.year
-        DF["month"] = pd.to_datetime(DF["date"]).dt.month
-
-    if not bd.empty and "date" in bd.columns:
-        bd["year"] = pd.to_datetime(bd["date"]).dt.year
-        bd["month"] = pd.to_datetime(bd["date"]).dt.month
+    # --- Monthly totals per account_group (charts below); undated rows are not in it ---
+    agg = _monthly_agg(DF, DATA_KEY, year)
 
-    # --- KPI calculations ---
-    k = kpis(DF)  # from lib.metrics
-    total_revenue = k["Revenue"]
-    gross_profit = k["Gross Profit"]
-    net_profit = k["EBIT"]
-    cogs_val = DF.loc[DF["account_group"].eq("COGS"), "signed_amount"].sum()
-    opex_val = DF.loc[DF["account_group"].eq("OPEX"), "signed_amount"].sum()
+    # --- KPI calculations: one pass over DF, so rows with unparseable dates still count ---
+    totals = DF.groupby("account_group", observed=True)["signed_amount"].sum()
+    total_revenue = totals.get("Revenue", 0.0)
+    cogs_val = totals.get("COGS", 0.0)
+    opex_val = totals.get("OPEX", 0.0)
+    gross_profit = total_revenue + cogs_val
+    net_profit = gross_profit + opex_val
 
     # --- Budget Utilization (COGS only) ---
-    actual_cogs_spend = abs(DF.loc[DF["account_group"].eq("COGS"), "signed_amount"].sum())
+    actual_cogs_spend = abs(cogs_val)
 
+    # one pass over bd for every budget total used below
     if not bd.empty:
-        total_budget_cogs = bd.loc[bd["account_group"].eq("COGS"), "budget_amount"].sum()
+        bud_totals = bd.groupby("account_group", observed=True, dropna=False)["budget_amount"].sum()
     else:
-        total_budget_cogs = 0.0
+        bud_totals = pd.Series(dtype="float64")
+    total_budget_cogs = bud_totals.get("COGS", 0.0)
 
     budget_util_pct = (actual_cogs_spend / total_budget_cogs * 100) if total_budget_cogs else 0.0
 
@@ -243,23 +433,13 @@ if page == "Overview":
 
     # Budget Utilization (% of total budget used by absolute actuals)
     if not bd.empty:
-        total_budget = bd["budget_amount"].sum()
-        budget_util = (abs(DF["signed_amount"].sum()) / total_budget * 100) if total_budget else 0
+        total_budget = bud_totals.sum()
+        budget_util = (abs(totals.sum()) / total_budget * 100) if total_budget else 0
     else:
         budget_util = 0
 
     # --- KPI Cards Row (6 compact cards) ---
     # --- KPI Cards Row (spacious: 3 per row) ---
-    kpi_style = """
-    <style>
-    .kpi-card { background:#f9fafb; border-radius:12px; padding:20px;
-                box-shadow:0 2px 5px rgba(0,0,0,0.05); text-align:center; margin-bottom:20px; }
-    .kpi-value { font-size:1.6rem; font-weight:700; }
-    .kpi-sub   { font-size:0.9rem; }
-    </style>
-    """
-    st.markdown(kpi_style, unsafe_allow_html=True)
-
     # Row 1
     c1, c2, c3 = st.columns(3)
     c1.markdown(kpi_card_md("Revenue", total_revenue, "green", f"▲ {gp_margin:.1f}% GP margin"), unsafe_allow_html=True)
@@ -291,43 +471,11 @@ if page == "Overview":
     # --- Revenue vs Expense (Yearly) ---
     st.subheader("Revenue vs Expense (Yearly)")
 
-    rev_year = (
-        DF[DF["account_group"].eq("Revenue")]
-        .groupby("year", as_index=False)["signed_amount"].sum()
-        .rename(columns={"signed_amount": "Revenue"})
-    )
-
-    exp_year = (
-        DF[DF["account_group"].isin(["COGS", "OPEX"])]
-        .groupby("year", as_index=False)["signed_amount"].sum()
-        .rename(columns={"signed_amount": "Expenses"})
-    )
-
-    rev_exp = pd.merge(rev_year, exp_year, on="year", how="outer").fillna(0)
-
-    fig_rev_exp = go.Figure()
-    fig_rev_exp.add_bar(x=rev_exp["year"], y=rev_exp["Revenue"], name="Revenue")
-    fig_rev_exp.add_bar(x=rev_exp["year"], y=rev_exp["Expenses"], name="Expenses")
-    fig_rev_exp.update_layout(
-        barmode="group",
-        yaxis_title="₦",
-        xaxis_title="Year",
-        margin=dict(l=0, r=0, t=10, b=0)
-    )
+    fig_rev_exp, fig_exp = _overview_figs(agg, DATA_KEY, year)
     st.plotly_chart(fig_rev_exp, use_container_width=True)
 
     # --- Expenses Breakdown (Monthly) ---
     st.subheader(" Expenses Breakdown (Monthly)")
-    exp_month = (
-        DF[DF["account_group"].isin(["COGS", "OPEX"])]
-        .groupby(["year", "month", "account_group"], as_index=False)["signed_amount"].sum()
-    )
-    exp_month["Period"] = pd.to_datetime(dict(year=exp_month.year, month=exp_month.month, day=1))
-    fig_exp = go.Figure()
-    for grp in ["COGS", "OPEX"]:
-        temp = exp_month[exp_month["account_group"] == grp]
-        fig_exp.add_bar(x=temp["Period"], y=temp["signed_amount"], name=grp)
-    fig_exp.update_layout(barmode="stack", yaxis_title="₦", xaxis_title="Month", margin=dict(l=0,r=0,t=10,b=0))
     st.plotly_chart(fig_exp, use_container_width=True)
 
 
@@ -335,7 +483,7 @@ if page == "Overview":
     c1, c2, c3 = st.columns([1.6, 1.6, 1.0], gap="small")
     # ----- Better decision visuals -----
     # Current year (or filtered year) is already reflected in DF
-    rev_df = DF[DF["account_group"].eq("Revenue")].copy()
+    rev_df = DF[DF["is_rev"]]
 
     # Try to find a customer column
     cust_col = "NAME" if "NAME" in rev_df.columns else ("ACCOUNT" if "ACCOUNT" in rev_df.columns else None)
@@ -347,37 +495,34 @@ if page == "Overview":
             st.info("No customer column found. Showing revenue trend instead.")
             # Fallback: simple monthly revenue trend
             if "month" in rev_df.columns and "year" in rev_df.columns:
-                rev_df["Period"] = pd.to_datetime(dict(year=rev_df["year"], month=rev_df["month"], day=1))
-                tr = rev_df.groupby("Period", as_index=False)["signed_amount"].sum()
+                tr = rev_df["signed_amount"].groupby(rev_df["period_ts"].rename("Period")).sum().reset_index()
                 fig_tr = go.Figure()
                 fig_tr.add_scatter(x=tr["Period"], y=tr["signed_amount"], mode="lines+markers", name="Revenue")
                 fig_tr.update_layout(margin=dict(l=0, r=0, t=10, b=0), yaxis_title="₦")
                 st.plotly_chart(fig_tr, use_container_width=True)
         else:
-            rev_by_cust = (
-                rev_df.groupby(cust_col, as_index=False)["signed_amount"]
-                .sum()
-                .sort_values("signed_amount", ascending=False)
-            )
-            top5 = rev_by_cust.head(5).copy()
-            others = rev_by_cust["signed_amount"].iloc[5:].sum()
-            total_rev = rev_by_cust["signed_amount"].sum() or 1
+            rev_by_cust = rev_df.groupby(cust_col, as_index=False, observed=True)["signed_amount"].sum()
+            top5 = rev_by_cust.nlargest(5, "signed_amount")
+            all_rev = rev_by_cust["signed_amount"].sum()
+            others = all_rev - top5["signed_amount"].sum()
+            total_rev = all_rev or 1
             top5_share = (top5["signed_amount"].sum() / total_rev) * 100
 
             # Horizontal bar for Top 5
             fig_top5 = go.Figure()
             fig_top5.add_bar(
-                y=top5[cust_col][::-1],
-                x=top5["signed_amount"][::-1],
+                y=top5[cust_col].to_numpy(),
+                x=top5["signed_amount"].to_numpy(),
                 orientation="h",
-                text=[f"₦{v:,.0f}" for v in top5["signed_amount"][::-1]],
+                text=naira_labels(top5["signed_amount"]),
                 textposition="outside",
                 name="Top 5 Customers"
             )
             fig_top5.update_layout(
                 margin=dict(l=0, r=0, t=10, b=0),
                 xaxis_title="₦",
-                yaxis_title="Customer"
+                yaxis_title="Customer",
+                yaxis_autorange="reversed"  # largest on top
             )
             st.plotly_chart(fig_top5, use_container_width=True)
 
@@ -390,29 +535,30 @@ if page == "Overview":
 
         # Prefer Short_CLASS if available; else CLASS; else show Top Vendors
         bucket_col = "Short_CLASS" if "Short_CLASS" in DF.columns else ("CLASS" if "CLASS" in DF.columns else None)
-        exp_df = DF[DF["account_group"].isin(["COGS", "OPEX"])].copy()
-        exp_df["abs_amount"] = exp_df["signed_amount"].abs()
+        exp_df = DF[DF["is_exp"]]
 
         if bucket_col:
             top_costs = (
-                exp_df.groupby(bucket_col, as_index=False)["abs_amount"]
+                exp_df["abs_amount"].groupby(exp_df[bucket_col], observed=True)
                 .sum()
-                .sort_values("abs_amount", ascending=False)
-                .head(10)
+                .nlargest(10)
+                .rename("abs_amount")
+                .reset_index()
             )
             fig_costs = go.Figure()
             fig_costs.add_bar(
-                y=top_costs[bucket_col][::-1],
-                x=top_costs["abs_amount"][::-1],
+                y=top_costs[bucket_col].to_numpy(),
+                x=top_costs["abs_amount"].to_numpy(),
                 orientation="h",
-                text=[f"₦{v:,.0f}" for v in top_costs["abs_amount"][::-1]],
+                text=naira_labels(top_costs["abs_amount"]),
                 textposition="outside",
                 name="Cost Buckets"
             )
             fig_costs.update_layout(
                 margin=dict(l=0, r=0, t=10, b=0),
                 xaxis_title="₦",
-                yaxis_title=bucket_col.replace("_", " ")
+                yaxis_title=bucket_col.replace("_", " "),
+                yaxis_autorange="reversed"
             )
             st.plotly_chart(fig_costs, use_container_width=True)
             st.caption(
@@ -421,23 +567,25 @@ if page == "Overview":
             vend_col = "NAME" if "NAME" in exp_df.columns else ("ACCOUNT" if "ACCOUNT" in exp_df.columns else None)
             if vend_col:
                 top_vendors = (
-                    exp_df.groupby(vend_col, as_index=False)["abs_amount"]
+                    exp_df["abs_amount"].groupby(exp_df[vend_col], observed=True)
                     .sum()
-                    .sort_values("abs_amount", ascending=False)
-                    .head(10)
+                    .nlargest(10)
+                    .rename("abs_amount")
+                    .reset_index()
                 )
                 fig_vendors = go.Figure()
                 fig_vendors.add_bar(
-                    y=top_vendors[vend_col][::-1],
-                    x=top_vendors["abs_amount"][::-1],
+                    y=top_vendors[vend_col].to_numpy(),
+                    x=top_vendors["abs_amount"].to_numpy(),
                     orientation="h",
-                    text=[f"₦{v:,.0f}" for v in top_vendors["abs_amount"][::-1]],
+                    text=naira_labels(top_vendors["abs_amount"]),
                     textposition="outside",
                 )
                 fig_vendors.update_layout(
                     margin=dict(l=0, r=0, t=10, b=0),
                     xaxis_title="₦",
-                    yaxis_title="Vendor"
+                    yaxis_title="Vendor",
+                    yaxis_autorange="reversed"
                 )
                 st.plotly_chart(fig_vendors, use_container_width=True)
                 st.caption(" Consider re‑bids or framework agreements for your top vendors.")
@@ -452,15 +600,9 @@ elif page == "Revenue":
     st.title("Revenue")
 
     # ---------- Local filters (year + month) ----------
-    rev_all = DF[DF["account_group"].eq("Revenue")].copy()
-
-    # Ensure year/month exist
-    if "year" not in rev_all.columns and "date" in rev_all.columns:
-        rev_all["year"] = pd.to_datetime(rev_all["date"]).dt.year
-        rev_all["month"] = pd.to_datetime(rev_all["date"]).dt.month
+    rev_all = DF[DF["is_rev"]]
 
     years_rev = sorted(rev_all["year"].dropna().unique())
-    month_names = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
     months = list(range(1, 13))
 
     # Place before your revenue charts/tables
@@ -478,24 +620,15 @@ elif page == "Revenue":
             "Month",
             options=months,
             default=months,
-            format_func=lambda m: month_names[m - 1],
+            format_func=lambda m: _MONTH_NAMES[m - 1],
             key="rev_months"
         )
 
     # Custom CSS for wider dropdown/multiselect
-    st.markdown(
-        """
-        <style>
-        div[data-baseweb="select"] {
-            min-width: 250px;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
+    st.markdown(_WIDE_SELECT_CSS, unsafe_allow_html=True)
 
     # Apply filters
-    R = rev_all.copy()
+    R = rev_all
     if year_rev != "All":
         R = R[R["year"].eq(int(year_rev))]
     if month_sel:
@@ -517,13 +650,10 @@ elif page == "Revenue":
 
     # Budget for the same slice (if provided)
     if not bd.empty:
-        b = bd.copy()
-        # make sure account_group and period columns exist
-        if "year" not in b.columns and "date" in b.columns:
-            b["year"] = pd.to_datetime(b["date"]).dt.year
+        b = bd
         has_month = ("month" in b.columns) and b["month"].notna().any()
 
-        b_rev = b[b["account_group"].eq("Revenue")].copy()
+        b_rev = b[b["account_group"].eq("Revenue")]
         if year_rev != "All":
             b_rev = b_rev[b_rev["year"].eq(int(year_rev))]
         if has_month:
@@ -570,34 +700,31 @@ elif page == "Revenue":
             .rename(columns={"signed_amount": "Revenue"})
             .sort_values(["year", "month"])
         )
-        tmp["Period"] = pd.to_datetime(dict(year=tmp["year"], month=tmp["month"], day=1))
+        tmp["Period"] = pd.PeriodIndex.from_fields(year=tmp["year"], month=tmp["month"], freq="M").to_timestamp()
         fig_simple = go.Figure()
         fig_simple.add_bar(x=tmp["Period"], y=tmp["Revenue"], name="Revenue")
         fig_simple.update_layout(margin=dict(l=0, r=0, t=10, b=0), yaxis_title="₦", xaxis_title="Month")
         st.plotly_chart(fig_simple, use_container_width=True)
     else:
         # 1) Leaderboard – Top projects in the current filter (year/month)
-        by_proj = (
-            R.groupby(proj_col, as_index=False)["signed_amount"].sum()
-            .rename(columns={"signed_amount": "Revenue"})
-            .sort_values("Revenue", ascending=False)
-        )
-        topN = by_proj.head(15)
+        by_proj = _top_projects(R, DATA_KEY, year_rev, tuple(month_sel), proj_col)
+        topN = by_proj.nlargest(15, "Revenue")
         fig_lead = go.Figure()
         fig_lead.add_bar(
-            y=topN[proj_col][::-1],
-            x=topN["Revenue"][::-1],
+            y=topN[proj_col].to_numpy(),
+            x=topN["Revenue"].to_numpy(),
             orientation="h",
-            text=[f"₦{v:,.0f}" for v in topN["Revenue"][::-1]],
+            text=naira_labels(topN["Revenue"]),
             textposition="outside",
             name="Projects"
         )
-        fig_lead.update_layout(margin=dict(l=0, r=0, t=10, b=0), xaxis_title="₦", yaxis_title="Project")
+        fig_lead.update_layout(margin=dict(l=0, r=0, t=10, b=0), xaxis_title="₦", yaxis_title="Project",
+                               yaxis_autorange="reversed")
         st.plotly_chart(fig_lead, use_container_width=True)
 
         # Concentration note (Top 5 share)
         total_slice = by_proj["Revenue"].sum() or 1
-        top5_share = (by_proj["Revenue"].head(5).sum() / total_slice) * 100
+        top5_share = (by_proj["Revenue"].nlargest(5).sum() / total_slice) * 100
         st.caption(f"🎯 Top 5 projects concentration: **{top5_share:.1f}%** of revenue.")
 
         st.markdown("---")
@@ -616,20 +743,15 @@ elif page == "Revenue":
         )
 
         # Build monthly series (ensure all 12 months exist)
-        month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-        base = (
+        full = (
             rev_all[rev_all["year"].eq(flow_year)]
-            .groupby("month", as_index=False)["signed_amount"]
+            .groupby("month")["signed_amount"]
             .sum()
-            .rename(columns={"signed_amount": "Revenue"})
-        )
-
-        full = (
-            pd.DataFrame({"month": list(range(1, 13))})
-            .merge(base, on="month", how="left")
-            .fillna({"Revenue": 0})
+            .reindex(range(1, 13), fill_value=0)  # one aligned lookup instead of a left merge + fillna
+            .rename_axis("month")
+            .reset_index(name="Revenue")
         )
-        full["MonthName"] = full["month"].map(lambda m: month_names[m - 1])
+        full["MonthName"] = full["month"].map(lambda m: _MONTH_NAMES[m - 1])
         full["Cumulative"] = full["Revenue"].cumsum()
 
         fig_flow = go.Figure()
@@ -657,40 +779,38 @@ elif page == "Revenue":
         )
 
         # Filter the revenue slice to the chosen year
-        base_y = R[R["year"].eq(pivot_year)].copy()  # R is your page-level filtered revenue
+        base_y = R[R["year"].eq(pivot_year)]  # R is your page-level filtered revenue
 
         # Top 20 projects for that year (keeps table readable)
         by_proj_y = (
-            base_y.groupby(proj_col, as_index=False)["signed_amount"].sum()
+            base_y.groupby(proj_col, as_index=False, observed=True)["signed_amount"].sum()
             .rename(columns={"signed_amount": "Revenue"})
-            .sort_values("Revenue", ascending=False)
+            .nlargest(20, "Revenue")
         )
-        keep = by_proj_y[proj_col].head(20).tolist()
+        keep = by_proj_y[proj_col].tolist()
 
-        slice_small = base_y[base_y[proj_col].isin(keep)].copy()
+        slice_small = base_y[base_y[proj_col].isin(keep)]
         if "month" not in slice_small.columns or "year" not in slice_small.columns:
             st.info("Month/Year columns missing for pivot.")
         else:
             # Build pivot and make sure all 12 months show in order
             piv = slice_small.pivot_table(
                 index=proj_col, columns="month", values="signed_amount",
-                aggfunc="sum", fill_value=0
+                aggfunc="sum", fill_value=0, observed=True
             )
             piv = piv.reindex(columns=range(1, 13), fill_value=0)  # ensure Jan..Dec columns exist
             # Keep same project order as leaderboard
             piv = piv.loc[keep]
 
             # Pretty month headers
-            month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-            piv.columns = [month_names[m - 1] for m in piv.columns]
+            piv.columns = [_MONTH_NAMES[m - 1] for m in piv.columns]
 
             st.dataframe(piv.style.format("₦{:,.0f}"), use_container_width=True)
 
     # ---------- Seasonality heatmap (Year × Month) ----------
     st.subheader("Seasonality Heatmap")
-    heat = rev_all.groupby(["year","month"], as_index=False)["signed_amount"].sum()
-    heat_p = heat.pivot_table(index="year", columns="month", values="signed_amount", aggfunc="sum", fill_value=0).sort_index()
-    heat_p.columns = [month_names[m-1] for m in heat_p.columns]
+    heat_p = _seasonality(rev_all, DATA_KEY)
+    heat_p.columns = [_MONTH_NAMES[m-1] for m in heat_p.columns]
     st.dataframe(heat_p.style.format("₦{:,.0f}").background_gradient(cmap="Blues"), use_container_width=True)
 
 
@@ -700,11 +820,6 @@ elif page == "Revenue":
 elif page == "Expenses":
     st.title("Expenses (₦)")
 
-    # Ensure period columns
-    if "year" not in DF.columns and "date" in DF.columns:
-        DF["year"] = pd.to_datetime(DF["date"]).dt.year
-        DF["month"] = pd.to_datetime(DF["date"]).dt.month
-
     # Choose a "project" field if available; else fall back gracefully
     project_col = "PROJECT" if "PROJECT" in DF.columns else ("NAME" if "NAME" in DF.columns else ("ACCOUNT" if "ACCOUNT" in DF.columns else None))
     if project_col is None:
@@ -718,13 +833,24 @@ elif page == "Expenses":
     with rightc:
         breakdown = st.radio("Breakdown", ([breakdown_default] + ["Classification"]) if project_col else ["Classification"], horizontal=True)
 
-    # Base expenses data
-    EXP = DF[DF["account_group"].isin(["COGS", "OPEX"])].copy()
-    EXP["abs_amount"] = EXP["signed_amount"].abs()
+    # Pick the 4th-column / line-item field from 01.xlsx
+    line_item_col = None
+    for c in ["ACCOUNT", "Account", "PROJECT", "Project"]:
+        if c in DF.columns:
+            line_item_col = c
+            break
+
+    # Base expenses data, pre-aggregated once to the grain every view below needs
+    EXP = DF[DF["is_exp"]]
+    agg_keys = ["year", "month", "period_ts", "account_group"]
+    for c in (project_col, line_item_col, "CLASS", "Short_CLASS"):
+        if c and c in EXP.columns and c not in agg_keys:
+            agg_keys.append(c)
+    AGG = _expense_agg(EXP, DATA_KEY, year, tuple(agg_keys))
 
     # Totals KPI
-    total_opex = EXP.loc[EXP["account_group"].eq("OPEX"), "abs_amount"].sum()
-    total_cogs = EXP.loc[EXP["account_group"].eq("COGS"), "abs_amount"].sum()
+    total_opex = AGG.loc[AGG["account_group"].eq("OPEX"), "abs_amount"].sum()
+    total_cogs = AGG.loc[AGG["account_group"].eq("COGS"), "abs_amount"].sum()
     c1, c2 = st.columns(2)
     c1.markdown(kpi_card_md("OPEX (Total)", total_opex, "#f59e0b", ""), unsafe_allow_html=True)
     c2.markdown(kpi_card_md("COGS (Total)", total_cogs, "#ef4444", ""), unsafe_allow_html=True)
@@ -734,17 +860,17 @@ elif page == "Expenses":
     # ---------- Time series: stacked COGS + OPEX ----------
     st.subheader("Expenses Over Time")
     if granularity == "Monthly":
-        EXP["Period"] = pd.to_datetime(dict(year=EXP["year"], month=EXP["month"], day=1))
-        grp = EXP.groupby(["Period", "account_group"], as_index=False)["abs_amount"].sum()
+        grp = (
+            AGG.groupby(["period_ts", "account_group"], as_index=False, observed=True)["abs_amount"].sum()
+            .rename(columns={"period_ts": "Period"})
+        )
     else:  # Yearly
-        grp = EXP.groupby(["year", "account_group"], as_index=False)["abs_amount"].sum()
+        grp = AGG.groupby(["year", "account_group"], as_index=False, observed=True)["abs_amount"].sum()
         grp = grp.rename(columns={"year": "Period"})
 
-    fig_exp = go.Figure()
-    for grp_name in ["COGS", "OPEX"]:
-        temp = grp[grp["account_group"] == grp_name]
-        fig_exp.add_bar(x=temp["Period"], y=temp["abs_amount"], name=grp_name)
-    fig_exp.update_layout(barmode="stack", yaxis_title="₦", xaxis_title="Period", margin=dict(l=0,r=0,t=10,b=0))
+    fig_exp = px.bar(grp, x="Period", y="abs_amount", color="account_group", barmode="stack",
+                     category_orders={"account_group": ["COGS", "OPEX"]})
+    fig_exp.update_layout(yaxis_title="₦", xaxis_title="Period", legend_title_text=None, margin=dict(l=0,r=0,t=10,b=0))
     st.plotly_chart(fig_exp, use_container_width=True)
 
     # ---------- Breakdown section ----------
@@ -753,7 +879,7 @@ elif page == "Expenses":
     if breakdown == "Project" and project_col:
         st.caption(f"By {project_col}")
         top_n = (
-            EXP.groupby(project_col, as_index=False)["abs_amount"].sum()
+            AGG.groupby(project_col, as_index=False, observed=True)["abs_amount"].sum()
             .sort_values("abs_amount", ascending=False)
             .head(15)
         )
@@ -761,35 +887,37 @@ elif page == "Expenses":
 
         # Optional: table by project and month/year
         if granularity == "Monthly":
-            piv = EXP.pivot_table(
+            piv = AGG.pivot_table(
                 index=project_col,
                 columns=["year", "month"],
                 values="abs_amount",
                 aggfunc="sum",
-                fill_value=0
+                fill_value=0,
+                observed=True
             )
-            piv = piv.sort_values(by=piv.columns.tolist(), ascending=False)
+            piv = piv.loc[piv.sum(axis=1).sort_values(ascending=False, kind="stable").index]  # biggest total spend first
         else:
-            piv = EXP.pivot_table(
+            piv = AGG.pivot_table(
                 index=project_col,
                 columns="year",
                 values="abs_amount",
                 aggfunc="sum",
-                fill_value=0
+                fill_value=0,
+                observed=True
             )
-            piv = piv.sort_values(by=piv.columns.tolist(), ascending=False)
+            piv = piv.loc[piv.sum(axis=1).sort_values(ascending=False, kind="stable").index]  # biggest total spend first
 
     # Classification view (Chart of Accounts style)
     st.caption("By Classification (CLASS and Short_CLASS)")
     colA, colB = st.columns(2)
     with colA:
         st.markdown("**By CLASS**")
-        by_class = EXP.groupby("CLASS", as_index=False)["abs_amount"].sum().sort_values("abs_amount", ascending=False)
+        by_class = AGG.groupby("CLASS", as_index=False, observed=True)["abs_amount"].sum().sort_values("abs_amount", ascending=False)
         st.bar_chart(by_class.set_index("CLASS")["abs_amount"])
     with colB:
         st.markdown("**By Short_CLASS**")
-        if "Short_CLASS" in EXP.columns:
-            by_short = EXP.groupby("Short_CLASS", as_index=False)["abs_amount"].sum().sort_values("abs_amount", ascending=False)
+        if "Short_CLASS" in AGG.columns:
+            by_short = AGG.groupby("Short_CLASS", as_index=False, observed=True)["abs_amount"].sum().sort_values("abs_amount", ascending=False)
             st.bar_chart(by_short.set_index("Short_CLASS")["abs_amount"])
         else:
             st.info("No Short_CLASS column found.")
@@ -800,28 +928,12 @@ elif page == "Expenses":
     st.markdown("---")
     st.subheader("Expense Summary by Line Item")
 
-    # Pick the 4th-column / line-item field from 01.xlsx
-    line_item_col = None
-    for c in ["ACCOUNT", "Account", "PROJECT", "Project"]:
-        if c in DF.columns:
-            line_item_col = c
-            break
-
     if line_item_col is None:
         st.info("Could not find the line-item column (e.g., 'ACCOUNT' or 'PROJECT') in 01 data.")
     else:
-        # Make sure year/month are available
-        if "year" not in DF.columns and "date" in DF.columns:
-            DF["year"] = pd.to_datetime(DF["date"]).dt.year
-            DF["month"] = pd.to_datetime(DF["date"]).dt.month
-
-        # Work only with expenses (COGS + OPEX) and use absolute values for spend
-        EXP = DF[DF["account_group"].isin(["COGS", "OPEX"])].copy()
-        EXP["abs_amount"] = EXP["signed_amount"].abs()
-
+        # Reuses the page's expense pre-aggregate (COGS + OPEX, absolute spend)
         # ---- Filters (unique keys to avoid collisions) ----
-        years_exp = sorted(EXP["year"].dropna().unique())
-        month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+        years_exp = sorted(AGG["year"].dropna().unique())
         months_all = list(range(1, 12 + 1))
 
         f1, f2, _ = st.columns([1.2, 2.2, 3])
@@ -832,20 +944,21 @@ elif page == "Expenses":
                 "Month",
                 options=months_all,
                 default=months_all,
-                format_func=lambda m: month_names[m - 1],
+                format_func=lambda m: _MONTH_NAMES[m - 1],
                 key="exp_sum_months"
             )
 
-        # Apply filters
-        E = EXP.copy()
+        # Apply filters (to the pre-aggregate; it keeps year, month and the line item)
+        mask = np.ones(len(AGG), dtype=bool)
         if year_exp != "All":
-            E = E[E["year"].eq(int(year_exp))]
+            mask &= AGG["year"].to_numpy() == int(year_exp)
         if month_exp:
-            E = E[E["month"].isin(month_exp)]
+            mask &= AGG["month"].isin(month_exp).to_numpy()
+        E = AGG[mask]
 
         # Group by the line item (4th column) and sum spend
         summary = (
-            E.groupby(line_item_col, as_index=False)["abs_amount"]
+            E.groupby(line_item_col, as_index=False, observed=True)["abs_amount"]
             .sum()
             .rename(columns={"abs_amount": "Amount"})
             .sort_values("Amount", ascending=False)
@@ -865,10 +978,10 @@ elif page == "Expenses":
         # (Optional) quick monthly pivot per line item — handy for spotting seasonality
         with st.expander("Monthly pivot by line item"):
             piv = (
-                E.pivot_table(index=line_item_col, columns="month", values="abs_amount", aggfunc="sum", fill_value=0)
+                E.pivot_table(index=line_item_col, columns="month", values="abs_amount", aggfunc="sum", fill_value=0, observed=True)
                 .reindex(columns=months_all, fill_value=0)
             )
-            piv.columns = [month_names[m - 1] for m in piv.columns]
+            piv.columns = [_MONTH_NAMES[m - 1] for m in piv.columns]
             st.dataframe(
                 piv.style.format("₦{:,.0f}"),
                 use_container_width=True
@@ -882,11 +995,6 @@ elif page == "Expenses":
 else:
     st.title("Statement of Profit & Loss ")
 
-    # Ensure period columns exist
-    if "year" not in DF.columns and "date" in DF.columns:
-        DF["year"] = pd.to_datetime(DF["date"]).dt.year
-        DF["month"] = pd.to_datetime(DF["date"]).dt.month
-
     # Controls: View (Year / Quarter / Month)
     colv, coly, colm = st.columns([1, 1, 1])
     with colv:
@@ -899,65 +1007,31 @@ else:
             sel_q = st.selectbox("Quarter", ["Q1","Q2","Q3","Q4"], index=0, key="pl_quarter")
             sel_month = None
         elif gran == "Month":
-            month_names = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
-            m_idx = st.selectbox("Month", list(range(1,13)), format_func=lambda m: month_names[m-1], key="pl_month")
+            m_idx = st.selectbox("Month", list(range(1,13)), format_func=lambda m: _MONTH_NAMES[m-1], key="pl_month")
             sel_q = None
             sel_month = m_idx
         else:
             sel_q = None
             sel_month = None
 
-    # Slice DF to the requested period
-    def slice_period(df, year, granularity, q=None, m=None):
-        df = df[df["year"].eq(int(year))].copy()
-        if granularity == "Quarter" and q:
-            qmap = {"Q1":[1,2,3], "Q2":[4,5,6], "Q3":[7,8,9], "Q4":[10,11,12]}
-            df = df[df["month"].isin(qmap[q])]
-        if granularity == "Month" and m:
-            df = df[df["month"].eq(int(m))]
-        return df
-
-    S = slice_period(DF, sel_year, gran, sel_q, sel_month)
+    # Section aggregates for the requested period, cached per data version and selection
+    pl_agg, oi_agg = _pl_sections(DF, DATA_KEY, int(sel_year), gran, sel_q, sel_month)
 
     # Helpers
     curr = "₦"
     def fmt(n): return f"{curr}{n:,.0f}"
 
-    # Section builders (group by ACCOUNT within each account_group bucket)
-    def section_rows(df, group_name):
-        part = df[df["account_group"].eq(group_name)].copy()
-        if part.empty:
-            return [], 0.0
-        by_line = (
-            part.groupby("ACCOUNT", dropna=False, as_index=False)["signed_amount"]
-                .sum()
-                .sort_values("signed_amount", ascending=False)
-        )
-        rows = [(str(a if pd.notna(a) else "Unknown"), v) for a, v in zip(by_line["ACCOUNT"], by_line["signed_amount"])]
-        subtotal = sum(v for _, v in rows)
-        return rows, subtotal
+    def rows_and_total(by_line):
+        labels = by_line["ACCOUNT"].astype(object).fillna("Unknown").astype(str)
+        return list(zip(labels, by_line["signed_amount"])), float(by_line["signed_amount"].sum())
 
     # Build sections
-    rev_rows, rev_total = section_rows(S, "Revenue")
-    cogs_rows, cogs_total = section_rows(S, "COGS")
-    opex_rows, opex_total = section_rows(S, "OPEX")
-
-    # Optional: detect "Other Income" if your chart uses a class/short class
-    if "Short_CLASS" in S.columns:
-        other_inc = S[S["Short_CLASS"].str.contains("other income", case=False, na=False)]
-    elif "CLASS" in S.columns:
-        other_inc = S[S["CLASS"].str.contains("other income", case=False, na=False)]
-    else:
-        other_inc = S[S["account_group"].eq("Other Income")] if "Other Income" in S.get("account_group", pd.Series([])).unique() else S.iloc[0:0]
+    rev_rows, rev_total = rows_and_total(pl_agg[pl_agg["account_group"].eq("Revenue")])
+    cogs_rows, cogs_total = rows_and_total(pl_agg[pl_agg["account_group"].eq("COGS")])
+    opex_rows, opex_total = rows_and_total(pl_agg[pl_agg["account_group"].eq("OPEX")])
 
-    if not other_inc.empty:
-        oi_rows = (
-            other_inc.groupby("ACCOUNT", as_index=False)["signed_amount"]
-            .sum()
-            .sort_values("signed_amount", ascending=False)
-        )
-        other_rows = [(str(a if pd.notna(a) else "Unknown"), v) for a, v in zip(oi_rows["ACCOUNT"], oi_rows["signed_amount"])]
-        other_total = sum(v for _, v in other_rows)
+    if not oi_agg.empty:
+        other_rows, other_total = rows_and_total(oi_agg)
     else:
         other_rows, other_total = [], 0.0
 
@@ -970,7 +1044,7 @@ else:
     elif gran == "Quarter":
         period_label = f"For the {sel_q} {sel_year}"
     else:
-        mn = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"][sel_month-1]
+        mn = _MONTH_NAMES[sel_month-1]
         period_label = f"For {mn} {sel_year}"
 
     st.caption(period_label)
@@ -987,60 +1061,60 @@ else:
               <td style="text-align:right;{style}">{amount}</td>
             </tr>"""
 
-        html = """
+        parts = ["""
         <div style="
             background:#111827;border-radius:12px;padding:18px 18px 8px;
             border:1px solid #1f2937; color:#e5e7eb; font-size:15px;">
           <table style="width:100%; border-collapse:separate; border-spacing:0 6px;">
-        """
+        """]
 
         # Trading Income
-        html += f'<tr><td colspan="2" style="font-weight:700; font-size:16px; color:#93c5fd;">Trading Income</td></tr>'
+        parts.append(f'<tr><td colspan="2" style="font-weight:700; font-size:16px; color:#93c5fd;">Trading Income</td></tr>')
         if rev_rows:
             for lbl, val in rev_rows:
-                html += tr(lbl, val, pad=True)
+                parts.append(tr(lbl, val, pad=True))
         else:
-            html += tr("—", 0, pad=True)
-        html += tr("Total Trading Income", rev_total, bold=True)
+            parts.append(tr("—", 0, pad=True))
+        parts.append(tr("Total Trading Income", rev_total, bold=True))
 
         # Cost of Sales
-        html += f'<tr><td colspan="2" style="height:6px;"></td></tr>'
-        html += f'<tr><td colspan="2" style="font-weight:700; font-size:16px; color:#93c5fd;">Cost of Sales</td></tr>'
+        parts.append(f'<tr><td colspan="2" style="height:6px;"></td></tr>')
+        parts.append(f'<tr><td colspan="2" style="font-weight:700; font-size:16px; color:#93c5fd;">Cost of Sales</td></tr>')
         if cogs_rows:
             for lbl, val in cogs_rows:
-                html += tr(lbl, val, pad=True)
+                parts.append(tr(lbl, val, pad=True))
         else:
-            html += tr("—", 0, pad=True)
-        html += tr("Total Cost of Sales", cogs_total, bold=True)
+            parts.append(tr("—", 0, pad=True))
+        parts.append(tr("Total Cost of Sales", cogs_total, bold=True))
 
         # Gross Profit
-        html += f'<tr><td colspan="2" style="height:6px;"></td></tr>'
-        html += tr("Gross Profit", gross_profit, bold=True)
+        parts.append(f'<tr><td colspan="2" style="height:6px;"></td></tr>')
+        parts.append(tr("Gross Profit", gross_profit, bold=True))
 
         # Other Income
         if other_rows:
-            html += f'<tr><td colspan="2" style="height:6px;"></td></tr>'
-            html += f'<tr><td colspan="2" style="font-weight:700; font-size:16px; color:#93c5fd;">Other Income</td></tr>'
+            parts.append(f'<tr><td colspan="2" style="height:6px;"></td></tr>')
+            parts.append(f'<tr><td colspan="2" style="font-weight:700; font-size:16px; color:#93c5fd;">Other Income</td></tr>')
             for lbl, val in other_rows:
-                html += tr(lbl, val, pad=True)
-            html += tr("Total Other Income", other_total, bold=True)
+                parts.append(tr(lbl, val, pad=True))
+            parts.append(tr("Total Other Income", other_total, bold=True))
 
         # Operating Expenses
-        html += f'<tr><td colspan="2" style="height:6px;"></td></tr>'
-        html += f'<tr><td colspan="2" style="font-weight:700; font-size:16px; color:#93c5fd;">Operating Expenses</td></tr>'
+        parts.append(f'<tr><td colspan="2" style="height:6px;"></td></tr>')
+        parts.append(f'<tr><td colspan="2" style="font-weight:700; font-size:16px; color:#93c5fd;">Operating Expenses</td></tr>')
         if opex_rows:
             for lbl, val in opex_rows:
-                html += tr(lbl, val, pad=True)
+                parts.append(tr(lbl, val, pad=True))
         else:
-            html += tr("—", 0, pad=True)
-        html += tr("Total Operating Expenses", opex_total, bold=True)
+            parts.append(tr("—", 0, pad=True))
+        parts.append(tr("Total Operating Expenses", opex_total, bold=True))
 
         # Net Profit
-        html += f'<tr><td colspan="2" style="height:8px;"></td></tr>'
-        html += tr("Net Profit", net_profit, bold=True)
+        parts.append(f'<tr><td colspan="2" style="height:8px;"></td></tr>')
+        parts.append(tr("Net Profit", net_profit, bold=True))
 
-        html += "</table></div>"
-        return html
+        parts.append("</table></div>")
+        return "".join(parts)
 
     st.markdown(render_pl_html(), unsafe_allow_html=True)
 
@@ -1097,9 +1171,16 @@ else:
 
     # Download Excel
     def to_excel_bytes(df):
+        # rows go straight to xlsxwriter in order, so constant_memory can flush each one as it's written
+        # (pandas' to_excel emits cells column by column, which that mode can't take)
         buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="P&L")
+        wb = xlsxwriter.Workbook(buf, {"constant_memory": True})
+        ws = wb.add_worksheet("P&L")
+        ws.write_row(0, 0, df.columns.tolist(), wb.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"}))
+        values = df.astype(object).where(df.notna(), None)  # blank cells for the header/spacer rows
+        for i, row in enumerate(values.itertuples(index=False), start=1):
+            ws.write_row(i, 0, row)
+        wb.close()
         buf.seek(0)
         return buf
 
@@ -1,4 +1,5 @@
 import base64
+from functools import lru_cache
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -17,7 +18,11 @@ def kpi_card_md(label, value, color="black", trend_text=""):
         value_fmt = str(value)
 
     trend_color = "green" if ("▲" in trend_text or "+" in trend_text) else ("red" if ("▼" in trend_text or "-" in trend_text) else "#777")
+    return _kpi_card_html(label, value_fmt, color, trend_text, trend_color)
 
+@lru_cache(maxsize=256)
+def _kpi_card_html(label, value_fmt, color, trend_text, trend_color):
+    # keyed on the already-formatted strings, so repeat cards across reruns are a dict lookup
     html = f"""
     <div style="padding:12px;border-radius:12px;background:#f7f7fb;box-shadow:0 1px 4px rgba(0,0,0,0.08);text-align:center;">
         <div style="font-size:12px;color:#666;margin-bottom:4px;">{label}</div>
@@ -27,8 +32,12 @@ def kpi_card_md(label, value, color="black", trend_text=""):
     """
     return html
 
+def naira_labels(values):
+    """Bar text labels ('₦1,234') for an array/Series of amounts, formatted in one map call."""
+    return pd.Series(values).map("₦{:,.0f}".format).to_numpy()
+
 def donut(df, group_col, value_col="signed_amount", title=""):
-    s = df.groupby(group_col, as_index=False)[value_col].sum().sort_values(value_col, ascending=False)
+    s = df.groupby(group_col, as_index=False, observed=True)[value_col].sum().sort_values(value_col, ascending=False)
     fig = px.pie(s, names=group_col, values=value_col, hole=0.6, title=title)
     fig.update_traces(textposition="inside", textinfo="percent+label")
     fig.update_layout(margin=dict(l=0, r=0, t=40, b=0))
@@ -43,7 +52,10 @@ def line_two(df, x, y1, y2, title=""):
 
 def waterfall_from_monthly(df, title="Net Profit/Loss by Month"):
     df = df.copy()
-    df["period"] = pd.to_datetime(dict(year=df["year"], month=df["month"], day=1))
+    if "period_ts" in df.columns:
+        df["period"] = df["period_ts"]
+    else:
+        df["period"] = pd.PeriodIndex.from_fields(year=df["year"], month=df["month"], freq="M").to_timestamp()
     df = df.sort_values("period")
     fig = go.Figure(go.Waterfall(
         x=df["period"].dt.strftime("%b"),
@@ -54,10 +66,15 @@ def waterfall_from_monthly(df, title="Net Profit/Loss by Month"):
     fig.update_layout(title=title, margin=dict(l=0, r=0, t=40, b=0))
     return fig
 
+@lru_cache(maxsize=4)
+def _b64_image(image_path):
+    # read + encode the logo once per process; every rerun re-injects the same string
+    with open(image_path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
 def inject_watermark(st, image_path="assets/logo.png", opacity=0.06):
     try:
-        with open(image_path, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode()
+        b64 = _b64_image(image_path)
         css = f"""
         <style>
         .stApp::before {{
@@ -5,34 +5,76 @@ from pathlib import Path
 TXN_FILE = "01.xlsx"
 BUDGET_FILE = "02_budget.xlsx"
 
+# Columns the pages read from tx (labels, periods, amounts and the precomputed flags);
+# load_all drops the rest (ID, raw Date/AMOUNT, DESCRIPTION, ...) so every slice/cache entry stays narrow
+TX_COLUMNS = (
+    "date", "year", "month", "period_ts",
+    "account_group", "signed_amount", "abs_amount",
+    "REVENUE/EXPENSES", "CLASS", "Short_CLASS", "ACCOUNT", "Account", "PROJECT", "Project", "NAME",
+    "is_other_income", "is_rev", "is_exp",
+)
+
+# Low-cardinality label columns -> category dtype (filters/groupbys then work on int codes)
+CATEGORY_COLS = ("account_group", "REVENUE/EXPENSES", "CLASS", "Short_CLASS", "PROJECT", "NAME", "ACCOUNT")
+
 def _norm_cols(df):
     df = df.copy()
     df.columns = [str(c).strip() for c in df.columns]
     return df
 
-def _infer_group(row):
-    side = str(row.get("REVENUE/EXPENSES", "")).strip().lower()
-    short = str(row.get("Short_CLASS", "")).strip().upper()
-    full = str(row.get("CLASS", "")).strip().lower()
-
-    if side == "revenue":
-        return "Revenue"
-    if side == "expenses":
+def _read_workbook(path):
+    # first sheet, Arrow-backed; calamine (Rust) parses xlsx far faster than openpyxl
+    try:
+        return pd.read_excel(path, engine="calamine", dtype_backend="pyarrow")
+    except ImportError:
+        # python-calamine not installed -> openpyxl
+        return pd.read_excel(path, engine="openpyxl", dtype_backend="pyarrow")
+
+def _infer_group(df):
+    # Vectorized over the whole frame; same rules/precedence as the old per-row version
+    side = df["REVENUE/EXPENSES"].astype(str).str.strip().str.lower()
+    short = df["Short_CLASS"].astype(str).str.strip().str.upper()
+    full = df["CLASS"].astype(str).str.strip().str.lower()
+
+    is_exp = side.eq("expenses")
+    conditions = [
+        side.eq("revenue"),
         # Prefer Short_CLASS if present
-        if short == "COS":
-            return "COGS"
-        if short in ("G&A", "GA", "GNA"):
-            return "OPEX"
+        is_exp & short.eq("COS"),
+        is_exp & short.isin(["G&A", "GA", "GNA"]),
         # Fallback to CLASS text
-        if full.startswith("cost of sales"):
-            return "COGS"
-        if "general & administrative" in full or "general and administrative" in full:
-            return "OPEX"
-    return None  # ignore anything else (assets/liab/etc.)
+        is_exp & full.str.startswith("cost of sales"),
+        is_exp & (full.str.contains("general & administrative", regex=False)
+                  | full.str.contains("general and administrative", regex=False)),
+    ]
+    choices = ["Revenue", "COGS", "OPEX", "COGS", "OPEX"]
+    grp = np.select([c.to_numpy(dtype=bool, na_value=False) for c in conditions], choices, default=None)
+    return pd.Series(grp, index=df.index, dtype=object)  # None = ignore (assets/liab/etc.)
+
+def other_income_mask(df):
+    # "other income" lines: matched on Short_CLASS if present, else CLASS (case-insensitive)
+    for col in ("Short_CLASS", "CLASS"):
+        if col in df.columns:
+            return df[col].astype(str).str.contains("other income", case=False, regex=False).to_numpy(dtype=bool)
+    return (df["account_group"].eq("Other Income") if "account_group" in df.columns
+            else pd.Series(False, index=df.index)).to_numpy(dtype=bool)
+
+def add_group_flags(df):
+    # Revenue / expense (COGS + OPEX) row masks, evaluated once instead of in every page filter
+    grp = df["account_group"]
+    df["is_rev"] = grp.eq("Revenue").to_numpy(dtype=bool)
+    df["is_exp"] = grp.isin(["COGS", "OPEX"]).to_numpy(dtype=bool)
+    return df
+
+def as_categories(df):
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
 
 def load_all(txn_path=TXN_FILE, budget_path=BUDGET_FILE):
     # ---- Load transactions
-    tx = pd.read_excel(txn_path)
+    tx = _read_workbook(txn_path)
     tx = _norm_cols(tx)
 
     # Required
@@ -50,25 +92,31 @@ def load_all(txn_path=TXN_FILE, budget_path=BUDGET_FILE):
     if "CLASS" not in tx.columns:
         tx["CLASS"] = ""
 
-    tx["account_group"] = tx.apply(_infer_group, axis=1)
+    tx["account_group"] = _infer_group(tx)
 
     # Signed amounts: Revenue +, COGS/OPEX −, drop non-P&L
-    def sign_amt(row):
-        grp = row["account_group"]
-        amt = row["AMOUNT"]
-        if grp == "Revenue":
-            return abs(amt)
-        if grp in ("COGS", "OPEX"):
-            return -abs(amt)
-        return np.nan
-
-    tx["signed_amount"] = tx.apply(sign_amt, axis=1)
+    amt = tx["AMOUNT"].astype("float64").abs().to_numpy()
+    grp = tx["account_group"]
+    tx["signed_amount"] = np.select(
+        [grp.eq("Revenue").to_numpy(), grp.isin(["COGS", "OPEX"]).to_numpy()],
+        [amt, -amt],
+        default=np.nan,
+    )
     tx = tx.dropna(subset=["signed_amount"])
+    # Arrow-backed like the columns read above, so the hot sums/groupbys run on Arrow kernels
+    tx["signed_amount"] = tx["signed_amount"].astype("double[pyarrow]")
+
+    # Helpers the pages use on every rerun, computed once here (NaT dates stay NaT)
+    tx["abs_amount"] = tx["signed_amount"].abs()
+    tx["period_ts"] = tx["date"].dt.to_period("M").dt.to_timestamp()  # first day of the month
+    tx["is_other_income"] = other_income_mask(tx)
+    tx = add_group_flags(tx)
+    tx = tx[[c for c in TX_COLUMNS if c in tx.columns]]
 
     # ---- Load & prepare budget if present (optional)
     bd = pd.DataFrame(columns=["year", "account_group", "budget_amount"])
     if Path(budget_path).exists():
-        b = pd.read_excel(budget_path)
+        b = _read_workbook(budget_path)
         b = _norm_cols(b)
         if "DATE" in b.columns:
             b["date"] = pd.to_datetime(b["DATE"], errors="coerce")
@@ -85,7 +133,7 @@ def load_all(txn_path=TXN_FILE, budget_path=BUDGET_FILE):
             b["Short_CLASS"] = ""
         if "CLASS" not in b.columns:
             b["CLASS"] = ""
-        b["account_group"] = b.apply(_infer_group, axis=1)
+        b["account_group"] = _infer_group(b)
 
         # Budget amount column
         bud_col = "BUDGET" if "BUDGET" in b.columns else "budget_amount"
@@ -96,4 +144,4 @@ def load_all(txn_path=TXN_FILE, budget_path=BUDGET_FILE):
         bd = b.groupby(["year", "account_group"], as_index=False)[bud_col].sum()
         bd = bd.rename(columns={bud_col: "budget_amount"})
 
-    return tx, bd
+    return as_categories(tx), as_categories(bd)
@@ -1,18 +1,42 @@
+import numpy as np
 import pandas as pd
 
 def kpis(df):
-    rev = df.loc[df["account_group"].eq("Revenue"), "signed_amount"].sum()
-    cogs = df.loc[df["account_group"].eq("COGS"), "signed_amount"].sum()
-    opex = df.loc[df["account_group"].eq("OPEX"), "signed_amount"].sum()
+    totals = df.groupby("account_group", observed=True)["signed_amount"].sum()
+    rev = totals.get("Revenue", 0.0)
+    cogs = totals.get("COGS", 0.0)
+    opex = totals.get("OPEX", 0.0)
     gross_profit = rev + cogs
     ebit = gross_profit + opex
     return {"Revenue": rev, "Gross Profit": gross_profit, "EBIT": ebit}
 
 def monthly_pnl(df):
-    g = df.groupby(["year", "month", "account_group"], as_index=False)["signed_amount"].sum()
-    pivot = g.pivot_table(index=["year","month"], columns="account_group", values="signed_amount", fill_value=0).reset_index()
+    pivot = (
+        df.groupby(["year", "month", "account_group"], observed=True)["signed_amount"].sum()
+        .unstack("account_group", fill_value=0)
+        .reset_index()
+    )
     for col in ("Revenue","COGS","OPEX"):
         if col not in pivot.columns: pivot[col] = 0
     pivot["Gross Profit"] = pivot["Revenue"] + pivot["COGS"]
     pivot["EBIT"] = pivot["Gross Profit"] + pivot["OPEX"]
     return pivot
+
+def group_year_month_sums(df):
+    # signed_amount per (account_group, year, month) in a single bincount pass;
+    # same shape as groupby(["year","month","account_group"]).sum().unstack("account_group").
+    # Rows with no year/month (unparseable dates) have no cell here and are dropped, so the
+    # result's .sum() is not a grand total; take totals from df itself (e.g. kpis(df)).
+    d = df.dropna(subset=["year", "month", "account_group"])
+    grp = pd.Categorical(d["account_group"]).remove_unused_categories()
+    years, y_idx = np.unique(d["year"].to_numpy(), return_inverse=True)
+    n_cells = len(years) * 12
+    flat = grp.codes * n_cells + y_idx * 12 + (d["month"].to_numpy().astype("int64") - 1)
+    amt = np.nan_to_num(d["signed_amount"].to_numpy(dtype="float64"))
+    sums = np.bincount(flat, weights=amt, minlength=len(grp.categories) * n_cells)
+    seen = np.bincount(flat % n_cells, minlength=n_cells) > 0  # keep only (year, month) cells with rows
+
+    index = pd.MultiIndex.from_product([years, range(1, 13)], names=["year", "month"])
+    out = pd.DataFrame(sums.reshape(len(grp.categories), n_cells).T, index=index,
+                       columns=pd.Index(grp.categories, name="account_group"))
+    return out[seen]